@@ -1,24 +1,41 @@
 import csv
-import json
 import math
 import os
+import threading
 import time
-from collections import Counter
+from collections import OrderedDict
 from io import StringIO
 
 import ee
 import geopandas as gpd
 import numpy as np
-import pandas as pd
+import orjson
+import shapely
 from dotenv import load_dotenv
 from flask import Flask, render_template, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from k_means_constrained import KMeansConstrained
 from shapely.geometry import Polygon
+from sklearn.cluster import KMeans
 from sqlalchemy import create_engine
 from sqlalchemy.sql import text
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, which encodes large GeoJSON payloads and NumPy values in C."""
+    # Dates pass through to Flask's default() so they keep its HTTP-date format instead of orjson's ISO 8601
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        # Flask's sort_keys/indent kwargs are ignored on purpose: responses are always compact and unsorted
+        return orjson.dumps(obj, option=self.option, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 load_dotenv()
 
@@ -51,7 +68,8 @@ DB_NAME = os.getenv("DB_NAME", "db")
 
 DB_CONNECTION_STRING = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DB_CONNECTION_STRING)
+# Connections are pooled and reused across requests; pre-ping replaces ones the server has dropped
+engine = create_engine(DB_CONNECTION_STRING, pool_size=10, max_overflow=20, pool_pre_ping=True)
 
 @app.route("/")
 def home():
@@ -72,21 +90,78 @@ def _calculate_cluster_sizes(n_samples, num_clusters, balance_tolerance=0.05):
     return base_size, min_size, max_size
 
 
+def _project_to_local_meters(coords):
+    """
+    Project [lng, lat] degrees onto a local equirectangular plane in meters.
+
+    A degree of longitude shrinks with cos(latitude), so raw degrees make Euclidean
+    distances anisotropic; scaling around the mean latitude keeps them in true meters.
+    The result is centred on the mean point, which keeps values small enough to hold
+    in float32 (half the memory traffic for the distance kernels) without losing precision.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    origin = coords.mean(axis=0)
+    cos_lat = math.cos(math.radians(origin[1]))
+    offsets = coords - origin
+    return np.ascontiguousarray(
+        np.column_stack([offsets[:, 0] * 111320 * cos_lat, offsets[:, 1] * 110540]),
+        dtype=np.float32
+    )
+
+
+def _principal_axis_initial_centers(coords, num_clusters, flatness=0.05):
+    """
+    Seed K-means for effectively one-dimensional layouts (buildings along a road, river or coast).
+
+    When the points barely spread off their principal axis, the means of num_clusters contiguous
+    runs of the sorted projection onto that axis are already close to the final centres. The runs
+    are only a seed: KMeansConstrained still assigns the points, so the size bounds and gaps between
+    settlements are respected. With more clusters than the strip's length/width ratio the runs
+    become thin slices across the strip, so the regular warm start is used instead.
+
+    Returns:
+    - (num_clusters, 2) array of initial centres, or None when the points are two-dimensional at
+      this number of clusters
+    """
+    centred = coords - coords.mean(axis=0)
+    _, singular_values, axes = np.linalg.svd(centred, full_matrices=False)
+    if singular_values[0] == 0:
+        return None
+    spread_ratio = singular_values[1] / singular_values[0]
+    if spread_ratio >= flatness or spread_ratio * num_clusters >= 1:
+        return None
+
+    runs = np.array_split(np.argsort(centred @ axes[0], kind='stable'), num_clusters)
+    return np.array([coords[run].mean(axis=0) for run in runs])
+
+
 def _run_constrained_kmeans(coords, num_clusters, min_size, max_size):
+    projected_coords = _project_to_local_meters(coords)
+    initial_centers = _principal_axis_initial_centers(projected_coords, num_clusters)
+    if initial_centers is None:
+        # Every constrained iteration solves a min-cost-flow problem, so warm-start from a cheap
+        # unconstrained Elkan K-means solution to need fewer of them
+        initial_centers = KMeans(
+            n_clusters=num_clusters,
+            n_init=1,
+            algorithm='elkan',
+            random_state=42
+        ).fit(projected_coords).cluster_centers_
     constrained_kmeans = KMeansConstrained(
         n_clusters=num_clusters,
         size_min=min_size,
         size_max=max_size,
+        init=initial_centers,
         max_iter=300,
         random_state=42,
         n_init=1,
         n_jobs=1
     )
-    return constrained_kmeans.fit_predict(coords)
+    return constrained_kmeans.fit_predict(projected_coords)
 
 
 def optimized_balanced_kmeans_constrained_with_buildings_count(buildingsGDF, coords, buildings_per_cluster,
-                                                               balance_tolerance=0.05):
+                                                               balance_tolerance=0.05, columnar=False):
     """
     Perform balanced K-means clustering targeting a fixed number of buildings per cluster.
 
@@ -95,6 +170,7 @@ def optimized_balanced_kmeans_constrained_with_buildings_count(buildingsGDF, coo
     - coords: numpy array of coordinates (n_samples, 2)
     - buildings_per_cluster: int, target number of buildings per cluster
     - balance_tolerance: float, tolerance for cluster size variation (default: 0.05)
+    - columnar: bool, return clusters as parallel arrays instead of one dict per building (default: False)
 
     Returns:
     - GeoDataFrame with cluster labels
@@ -104,11 +180,11 @@ def optimized_balanced_kmeans_constrained_with_buildings_count(buildingsGDF, coo
     _, min_size, max_size = _calculate_cluster_sizes(n_samples, num_clusters, balance_tolerance)
 
     labels = _run_constrained_kmeans(coords, num_clusters, min_size, max_size)
-    return getClustersData(buildingsGDF, coords, labels)
+    return getClustersData(buildingsGDF, coords, labels, columnar)
 
 
 def optimized_balanced_kmeans_constrained_with_no_of_clusters(buildingsGDF, coords, num_clusters=3,
-                                                              balance_tolerance=0.05):
+                                                              balance_tolerance=0.05, columnar=False):
     """
     Perform balanced K-means clustering with a specified number of clusters.
 
@@ -117,6 +193,7 @@ def optimized_balanced_kmeans_constrained_with_no_of_clusters(buildingsGDF, coor
     - coords: numpy array of coordinates (n_samples, 2)
     - num_clusters: int, number of clusters (default: 3)
     - balance_tolerance: float, tolerance for cluster size variation (default: 0.05)
+    - columnar: bool, return clusters as parallel arrays instead of one dict per building (default: False)
 
     Returns:
     - GeoDataFrame with cluster labels
@@ -125,29 +202,86 @@ def optimized_balanced_kmeans_constrained_with_no_of_clusters(buildingsGDF, coor
     _, min_size, max_size = _calculate_cluster_sizes(n_samples, num_clusters, balance_tolerance)
 
     labels = _run_constrained_kmeans(coords, num_clusters, min_size, max_size)
-    return getClustersData(buildingsGDF, coords, labels)
+    return getClustersData(buildingsGDF, coords, labels, columnar)
+
+def getClustersData(buildingsGDF, coords, cluster_labels, columnar=False):
+    labels = np.asarray(cluster_labels, dtype=np.int64)
+    label_offset = labels.min() if len(labels) else 0
+    cluster_counts = np.bincount(labels - label_offset)
+    buildingsGDF["cluster_label"] = labels.tolist()
 
-def getClustersData(buildingsGDF, coords, cluster_labels):
-    cluster_counts = Counter(cluster_labels)
+    if columnar:
+        # Parallel per-building arrays plus one count per cluster, instead of a dict per building
+        present = np.flatnonzero(cluster_counts)
+        return {
+            "coordinates": np.asarray(coords).tolist(),
+            "cluster": labels.tolist(),
+            "numOfBuildings": dict(zip((present + label_offset).tolist(), cluster_counts[present].tolist()))
+        }
+
+    # Size of each building's cluster, looked up by array indexing instead of a per-row Counter lookup
+    cluster_sizes = cluster_counts[labels - label_offset]
     # Convert the coordinates and their cluster labels into a list of dictionaries
     clusters = [
         {
-            "coordinates": [coord[0], coord[1]],  # Use latitude and longitude directly from the coord tuple
-            "cluster": int(cluster_label),  # Assign the cluster label
-            "numOfBuildings": cluster_counts[cluster_label]
+            "coordinates": coord,  # [lng, lat] pair straight from the coords array
+            "cluster": cluster_label,
+            "numOfBuildings": cluster_size
         }
-        for coord, cluster_label in zip(coords, cluster_labels)  # Iterate over coords and cluster labels
+        for coord, cluster_label, cluster_size in zip(np.asarray(coords).tolist(), labels.tolist(),
+                                                      cluster_sizes.tolist())
     ]
-    buildingsGDF["cluster_label"] = cluster_labels.tolist()
 
     return clusters
 
+def _extract_coordinates(features):
+    """Read each feature's longitude_latitude point straight into an (N, 2) float64 array."""
+    return np.fromiter(
+        (c for feature in features for c in feature['properties']['longitude_latitude']['coordinates']),
+        dtype=np.float64,
+        count=2 * len(features)
+    ).reshape(-1, 2)
+
 def getBuildingsDataFromGEE(polygon_coords, buildings_area_in_meters=0, buildings_confidence=0):
     if not polygon_coords:
         return jsonify({"error": "Invalid polygon coordinates"}), 400
 
+    polygon_key = tuple(tuple(float(c) for c in point) for point in polygon_coords)
+    cache_key = (polygon_key, buildings_area_in_meters, buildings_confidence)
+    with _gee_cache_lock:
+        payload = _gee_buildings_cache.get(cache_key)
+        if payload is not None:
+            _gee_buildings_cache.move_to_end(cache_key)
+    if payload is None:
+        payload = _fetch_buildings_from_gee(polygon_key, buildings_area_in_meters, buildings_confidence)
+        _cache_gee_buildings(cache_key, payload)
+    # Callers annotate the features in place, so every call gets its own copy of the cached result
+    return orjson.loads(payload)
+
+# Paged fetches have no feature cap, so the cache is bounded by the total size of the serialized payloads
+GEE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_gee_buildings_cache = OrderedDict()
+_gee_cache_bytes = 0
+_gee_cache_lock = threading.Lock()
+
+def _cache_gee_buildings(cache_key, payload):
+    """Store a serialized building fetch, evicting the least recently used entries to stay under GEE_CACHE_MAX_BYTES."""
+    global _gee_cache_bytes
+    if len(payload) > GEE_CACHE_MAX_BYTES // 4:
+        return  # Too large to be worth keeping resident
+    with _gee_cache_lock:
+        if cache_key in _gee_buildings_cache:
+            return
+        _gee_buildings_cache[cache_key] = payload
+        _gee_cache_bytes += len(payload)
+        while _gee_cache_bytes > GEE_CACHE_MAX_BYTES:
+            _, evicted = _gee_buildings_cache.popitem(last=False)
+            _gee_cache_bytes -= len(evicted)
+
+def _fetch_buildings_from_gee(polygon_key, buildings_area_in_meters, buildings_confidence):
+    """Fetch buildings for a polygon from Earth Engine, paging through computeFeatures, as serialized GeoJSON."""
     # Create EE Polygon geometry
-    region = ee.Geometry.Polygon(polygon_coords)
+    region = ee.Geometry.Polygon([list(point) for point in polygon_key])
     # Filter buildings inside the polygon
     filtered_buildings = buildings.filterBounds(region)
     if buildings_area_in_meters > 0:
@@ -155,12 +289,26 @@ def getBuildingsDataFromGEE(polygon_coords, buildings_area_in_meters=0, building
     if buildings_confidence > 0:
         filtered_buildings = filtered_buildings.filter(ee.Filter.gt('confidence', buildings_confidence))
 
+    # Page through the results with computeFeatures; a single getInfo() fails above 5000 elements
+    features = []
+    params = {'expression': filtered_buildings}
     try:
-        buildings_geojson = filtered_buildings.getInfo()
+        while True:
+            page = ee.data.computeFeatures(params)
+            features.extend(page.get('features', []))
+            if 'nextPageToken' not in page:
+                break
+            params['pageToken'] = page['nextPageToken']
     except ee.EEException as e:
-        raise Exception(
-            "Too many elements: The area contains more than 5000 buildings or grid cells. Please reduce the polygon size.")
-    return buildings_geojson
+        if _is_ee_size_error(e):
+            raise Exception(f"Error fetching buildings from Earth Engine: {e}. Please reduce the polygon size.")
+        raise Exception(f"Error fetching buildings from Earth Engine: {e}")
+    return orjson.dumps({"type": "FeatureCollection", "features": features})
+
+def _is_ee_size_error(error):
+    """Whether an EEException comes from the request being too large (memory, timeout, element limits)."""
+    message = str(error).lower()
+    return any(hint in message for hint in ("memory limit", "timed out", "accumulating over", "too large"))
 
 def getBuildingsDataFromDB(polygon_coords, buildings_area_in_meters=0.0, buildings_confidence=0.0, fetchWithRecordId=False, buildingSourceFilter=None):
     """
@@ -183,7 +331,9 @@ def getBuildingsDataFromDB(polygon_coords, buildings_area_in_meters=0.0, buildin
     polygon_wkt = polygon.wkt
 
     # Base query
+    # Parse the polygon once; the && bbox test is answered by the GIST index before the exact ST_Within check
     query = """
+            WITH region AS (SELECT ST_GeomFromText(%s, 4326) AS geom)
             SELECT DISTINCT ON (latitude, longitude)
                 id,
                 latitude,
@@ -192,8 +342,9 @@ def getBuildingsDataFromDB(polygon_coords, buildings_area_in_meters=0.0, buildin
                 confidence,
                 record_id,
                 ST_AsGeoJSON(ST_GeometryN(geometry, 1)) as geometry
-            FROM buildings
-            WHERE ST_Within(geometry, ST_GeomFromText(%s, 4326))
+            FROM buildings, region
+            WHERE buildings.geometry && region.geom
+              AND ST_Within(buildings.geometry, region.geom)
             """
     params = [polygon_wkt]
 
@@ -224,6 +375,28 @@ def getBuildingsDataFromDB(polygon_coords, buildings_area_in_meters=0.0, buildin
         if fetchWithRecordId:
             query += " AND record_id IS NOT NULL"
 
+    # Let PostGIS assemble the whole FeatureCollection so Python parses a single JSON document
+    query = f"""
+            SELECT json_build_object(
+                'type', 'FeatureCollection',
+                'features', COALESCE(json_agg(json_build_object(
+                    'type', 'Feature',
+                    'geometry', b.geometry::json,
+                    'properties', json_build_object(
+                        'id', b.id::text,
+                        'area_in_meters', b.area_in_meters,
+                        'confidence', COALESCE(b.confidence, 0),
+                        'full_plus_code', b.record_id,
+                        'longitude_latitude', json_build_object(
+                            'type', 'Point',
+                            'coordinates', json_build_array(b.longitude, b.latitude)
+                        )
+                    )
+                )), '[]'::json)
+            )::text
+            FROM ({query}) AS b
+            """
+
     conn = None
     cur = None
     try:
@@ -231,33 +404,8 @@ def getBuildingsDataFromDB(polygon_coords, buildings_area_in_meters=0.0, buildin
         cur = conn.cursor()
         cur.execute(query, tuple(params))
 
-        # Build features incrementally
-        features = []
-        for row in cur:
-            id, latitude, longitude, area_in_meters, confidence, record_id, geom_json = row
-            geometry = json.loads(geom_json)
-
-            feature = {
-                "type": "Feature",
-                "geometry": geometry,
-                "properties": {
-                    "id": str(id),
-                    "area_in_meters": area_in_meters,
-                    "confidence": confidence if confidence is not None else 0,
-                    "full_plus_code": record_id,
-                    "longitude_latitude": {
-                        "type": "Point",
-                        "coordinates": [longitude, latitude]
-                    }
-                }
-            }
-            features.append(feature)
-
         # Return as a GeoJSON FeatureCollection dict
-        return {
-            "type": "FeatureCollection",
-            "features": features
-        }
+        return orjson.loads(cur.fetchone()[0])
 
     except Exception as e:
         print(f"Error fetching data: {e}")
@@ -286,14 +434,15 @@ def get_building_density():
         dbType = data.get("dbType")
         fetchWithRecordId = bool(data.get("fetchWithRecordId", False))
         buildingSourceFilter = data.get("buildingSourceFilter", [])
+        columnarClusters = bool(data.get("columnarClusters", False))
 
 
         if clustering_type == "bottomUp":
-            result = handle_bottom_up_clustering(data, no_of_clusters, no_of_buildings, tolerance)
+            result = handle_bottom_up_clustering(data, no_of_clusters, no_of_buildings, tolerance, columnarClusters)
         else:
             result = handle_polygon_based_clustering(data, clustering_type, no_of_clusters, no_of_buildings, tolerance,
                                                      fetchClusters, dbType, buildings_area_in_meters, buildings_confidence,
-                                                     fetchWithRecordId, buildingSourceFilter)
+                                                     fetchWithRecordId, buildingSourceFilter, columnarClusters)
         return result
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -301,7 +450,8 @@ def get_building_density():
 def getBuildingsAroundPin(pin_lng, pin_lat, total_buildings_needed, tolerance=0.1):
     """
     Fetch buildings around a pin with initial 2km box, increment by 1.5x, capped at 10 km,
-    then perform a binary search for the optimal range.
+    then shrink the first sufficient box to the smallest half-width holding the required buildings,
+    read locally from the sorted Chebyshev distances of its centroids to the pin.
 
     Args:
         pin_lng (float): Longitude of the pin
@@ -325,42 +475,46 @@ def getBuildingsAroundPin(pin_lng, pin_lat, total_buildings_needed, tolerance=0.
     initial_delta = km_to_deg(2, pin_lat)  # 2 km radius in degrees
     max_delta = km_to_deg(10, pin_lat)  # Cap at 10 km radius in degrees
 
-    delta = initial_delta
-    bbox = create_bbox(pin_lng, pin_lat, delta)
+    # Every probe below is a sub-box of the 10 km cap, so narrow the full collection
+    # to that box once and let each probe filter the already-reduced collection.
+    nearby_buildings = buildings.filterBounds(create_bbox(pin_lng, pin_lat, max_delta))
 
-    # Step 1: Incrementally increase until sufficient buildings or max delta reached
-    filtered_buildings = fetch_buildings(bbox, pin_point)
-    building_count = filtered_buildings.size().getInfo()
+    # Step 1: Incrementally increase until sufficient buildings or max delta reached.
+    # Every expansion step is counted server-side in a single getInfo() round trip.
+    deltas = [initial_delta]
+    while deltas[-1] < max_delta:
+        deltas.append(min(deltas[-1] * 1.5, max_delta))  # Increase by 1.5x, but do not exceed 10 km
+    counts = count_buildings_for_deltas(pin_lng, pin_lat, deltas, nearby_buildings)
 
-    while building_count < min_buildings and delta < max_delta:
-        delta = min(delta * 1.5, max_delta)  # Increase by 1.5x, but do not exceed 10 km
-        bbox = create_bbox(pin_lng, pin_lat, delta)
-        filtered_buildings = fetch_buildings(bbox, pin_point)
-        building_count = filtered_buildings.size().getInfo()
+    step = next((i for i, count in enumerate(counts) if count >= min_buildings), len(deltas) - 1)
+    delta = deltas[step]
+    building_count = counts[step]
 
     # If still insufficient, use all available buildings
     if building_count < min_buildings:
+        filtered_buildings = fetch_buildings(create_bbox(pin_lng, pin_lat, delta), pin_point, nearby_buildings)
         sorted_buildings = filtered_buildings.sort('distance')
     else:
-        # Step 2: Binary search to find the smallest sufficient bounding box
-        left, right = initial_delta, delta
-        precision = km_to_deg(0.1, pin_lat)  # 0.1 km precision
-
-        while right - left > precision:
-            mid = (left + right) / 2
-            bbox = create_bbox(pin_lng, pin_lat, mid)
-            filtered_buildings = fetch_buildings(bbox, pin_point)
-            building_count = filtered_buildings.size().getInfo()
-
-            if building_count >= min_buildings:
-                right = mid
-            else:
-                left = mid
+        # Step 2: Find the smallest sufficient bounding box locally. The previous step's box was too
+        # small, so the answer lies between it and this one: download the centroids in this box once
+        # and read off the half-width that takes in min_buildings of them.
+        if step > 0 and min_buildings > 0:
+            try:
+                centroids = nearby_buildings.filterBounds(create_bbox(pin_lng, pin_lat, delta)) \
+                    .aggregate_array('longitude_latitude').getInfo()
+            except ee.EEException as e:
+                raise Exception("Error fetching buildings: Try a smaller area or fewer buildings.")
+            centroid_coords = np.array([point['coordinates'] for point in centroids], dtype=np.float64)
+            # A centroid is inside the box of half-width d when its Chebyshev distance to the pin is <= d
+            box_deltas = np.sort(np.abs(centroid_coords - [pin_lng, pin_lat]).max(axis=1)) \
+                if len(centroid_coords) else np.empty(0)
+            # filterBounds also counts footprints straddling the edge, so this box holds at least as many
+            if len(box_deltas) >= min_buildings:
+                delta = max(float(box_deltas[min_buildings - 1]), initial_delta)
 
         # Final fetch with optimized delta
-        delta = right
         bbox = create_bbox(pin_lng, pin_lat, delta)
-        filtered_buildings = fetch_buildings(bbox, pin_point)
+        filtered_buildings = fetch_buildings(bbox, pin_point, nearby_buildings)
         sorted_buildings = filtered_buildings.sort('distance').limit(max_buildings)
 
     try:
@@ -368,8 +522,7 @@ def getBuildingsAroundPin(pin_lng, pin_lat, total_buildings_needed, tolerance=0.
     except ee.EEException as e:
         raise Exception("Error fetching buildings: Try a smaller area or fewer buildings.")
 
-    coordinates = [feature['properties']['longitude_latitude']['coordinates']
-                   for feature in buildings_geojson['features']]
+    coordinates = _extract_coordinates(buildings_geojson['features'])
 
     # Warnings for building counts
     actual_count = len(coordinates)
@@ -384,7 +537,7 @@ def getBuildingsAroundPin(pin_lng, pin_lat, total_buildings_needed, tolerance=0.
     elif actual_count < total_buildings_needed and actual_count >= min_buildings:
         print(f"Warning: Fetched {actual_count} buildings, less than {total_buildings_needed} but within tolerance.")
 
-    return buildings_geojson, np.array(coordinates)
+    return buildings_geojson, coordinates
 
 def create_bbox(pin_lng, pin_lat, delta):
     """Utility function to create a bounding box around a pin."""
@@ -392,13 +545,28 @@ def create_bbox(pin_lng, pin_lat, delta):
     min_lat, max_lat = pin_lat - delta, pin_lat + delta
     return ee.Geometry.Rectangle([min_lng, min_lat, max_lng, max_lat])
 
-def fetch_buildings(bbox, pin_point):
-    """Fetch buildings within a bounding box and calculate distances."""
-    return buildings.filterBounds(bbox).map(
-        lambda feature: feature.set('distance', feature.geometry().centroid().distance(pin_point))
+def count_buildings(bbox, collection=None):
+    """Count buildings within a bounding box (from `collection`, default all buildings) without computing distances."""
+    if collection is None:
+        collection = buildings
+    return collection.filterBounds(bbox).size()
+
+def count_buildings_for_deltas(pin_lng, pin_lat, deltas, collection=None):
+    """Count buildings in the box around a pin for every delta with a single getInfo() round trip."""
+    return ee.List([
+        count_buildings(create_bbox(pin_lng, pin_lat, delta), collection) for delta in deltas
+    ]).getInfo()
+
+def fetch_buildings(bbox, pin_point, collection=None):
+    """Fetch buildings within a bounding box (from `collection`, default all buildings) and calculate distances."""
+    if collection is None:
+        collection = buildings
+    # Open Buildings already stores each footprint's centroid as the longitude_latitude point
+    return collection.filterBounds(bbox).map(
+        lambda feature: feature.set('distance', ee.Geometry(feature.get('longitude_latitude')).distance(pin_point))
     )
 
-def handle_bottom_up_clustering(data, no_of_clusters, no_of_buildings, tolerance):
+def handle_bottom_up_clustering(data, no_of_clusters, no_of_buildings, tolerance, columnarClusters=False):
     pin = data.get("pin")
     if not pin or len(pin) != 2:
         return jsonify({"error": "Invalid pin coordinates"}), 400
@@ -419,7 +587,7 @@ def handle_bottom_up_clustering(data, no_of_clusters, no_of_buildings, tolerance
 
     # Perform clustering
     clusters = optimized_balanced_kmeans_constrained_with_no_of_clusters(
-        buildings_geojson, coordinates, no_of_clusters, tolerance
+        buildings_geojson, coordinates, no_of_clusters, tolerance, columnarClusters
     )
 
     return jsonify({
@@ -430,7 +598,8 @@ def handle_bottom_up_clustering(data, no_of_clusters, no_of_buildings, tolerance
 
 
 def handle_polygon_based_clustering(data, clustering_type, no_of_clusters, no_of_buildings, tolerance, fetchClusters,
-                                    dbType, buildings_area_in_meters, buildings_confidence,  fetchWithRecordId, buildingSourceFilter
+                                    dbType, buildings_area_in_meters, buildings_confidence,  fetchWithRecordId, buildingSourceFilter,
+                                    columnarClusters=False
 ):
     polygon_coords = data.get("polygon", [])
     if not polygon_coords:
@@ -443,14 +612,10 @@ def handle_polygon_based_clustering(data, clustering_type, no_of_clusters, no_of
         except Exception as e:
             return jsonify({"error": f"Error fetching buildings from database: {str(e)}"}), 500
 
-    coordinates = [
-        feature['properties']['longitude_latitude']['coordinates']
-        for feature in buildings_geojson['features']
-    ]
-    if not coordinates:
+    coordinates = _extract_coordinates(buildings_geojson['features'])
+    if len(coordinates) == 0:
         return jsonify({"message": "No buildings found within the polygon", "building_count": 0}), 404
 
-    coordinates = np.array(coordinates)
     buildings_count = len(coordinates)
     clusters = None
 
@@ -458,11 +623,11 @@ def handle_polygon_based_clustering(data, clustering_type, no_of_clusters, no_of
         # Perform appropriate clustering based on the type
         if clustering_type == 'kMeans':
             clusters = optimized_balanced_kmeans_constrained_with_no_of_clusters(
-                buildings_geojson, coordinates, no_of_clusters, tolerance
+                buildings_geojson, coordinates, no_of_clusters, tolerance, columnarClusters
             )
         elif clustering_type == 'balancedKMeans':
             clusters = optimized_balanced_kmeans_constrained_with_buildings_count(
-                buildings_geojson, coordinates, no_of_buildings, tolerance
+                buildings_geojson, coordinates, no_of_buildings, tolerance, columnarClusters
             )
         else:
             return jsonify({"error": f"Unsupported clustering type: {clustering_type}"}), 400
@@ -575,25 +740,19 @@ def generate_grid(polygon_coords, grid_size_meters=50):
     x_steps = math.ceil((maxx - minx) / meters_to_deg)
     y_steps = math.ceil((maxy - miny) / meters_to_deg)
 
-    grids = []
-    for i in range(x_steps):
-        for j in range(y_steps):
-            x = minx + i * meters_to_deg
-            y = miny + j * meters_to_deg
-            grid_poly = Polygon([
-                [x, y],
-                [x + meters_to_deg, y],
-                [x + meters_to_deg, y + meters_to_deg],
-                [x, y + meters_to_deg],
-                [x, y]
-            ])
-            if polygon.intersects(grid_poly):
-                intersection = polygon.intersection(grid_poly)
-                if not intersection.is_empty and intersection.is_valid:
-                    grids.append(grid_poly)
+    # Prepare the polygon once so each per-cell intersects test reuses its
+    # edge index instead of rescanning every vertex.
+    shapely.prepare(polygon)
+
+    # Build every cell's lower-left corner at once (x-major, like the old nested loop)
+    xs = minx + np.arange(x_steps) * meters_to_deg
+    ys = miny + np.arange(y_steps) * meters_to_deg
+    x, y = (a.ravel() for a in np.meshgrid(xs, ys, indexing='ij'))
+    cells = shapely.box(x, y, x + meters_to_deg, y + meters_to_deg)
+    grids = cells[shapely.intersects(polygon, cells)]
 
     # Check if any grids were created
-    if not grids:
+    if len(grids) == 0:
         raise ValueError("No valid grid cells generated within the polygon")
 
     # Create GeoDataFrame with explicit geometry column and CRS
@@ -617,18 +776,19 @@ def assign_buildings_to_grids(buildings_geojson, grid_gdf):
     buildings_gdf['geometry'] = buildings_gdf.geometry.centroid
     buildings_gdf = buildings_gdf.set_geometry('geometry')
 
-    # Perform spatial join WITHOUT renaming geometry
-    joined = gpd.sjoin(buildings_gdf, grid_gdf, how='left', predicate='within')
+    # Query the grid R-tree directly: bbox filter first, exact 'within' test only on candidates.
+    # Grid cells don't overlap, so each building matches at most one cell.
+    building_pos, grid_pos = grid_gdf.sindex.query(buildings_gdf.geometry, predicate='within')
 
     # Now count buildings per grid
-    building_counts = joined['index_right'].value_counts().reindex(grid_gdf.index, fill_value=0)
-    grid_gdf['building_count'] = building_counts
+    grid_gdf['building_count'] = np.bincount(grid_pos, minlength=len(grid_gdf))
 
-    # Assign grid indices to buildings
+    # Assign grid indices to buildings (-1 for buildings outside every grid)
+    grid_indices = np.full(len(buildings_gdf), -1, dtype=np.int64)
+    grid_indices[building_pos] = grid_gdf.index.to_numpy()[grid_pos]
     buildings_geojson['features'] = [
-        {**f, 'properties': {**f['properties'], 'grid_index': int(joined['index_right'].iloc[i]) if not pd.isna(
-            joined['index_right'].iloc[i]) else -1}}
-        for i, f in enumerate(buildings_geojson['features'])
+        {**f, 'properties': {**f['properties'], 'grid_index': grid_index}}
+        for f, grid_index in zip(buildings_geojson['features'], grid_indices.tolist())
     ]
 
     return grid_gdf, buildings_geojson
@@ -713,15 +873,16 @@ def grid_clustering(grid_centroids, building_counts, num_clusters, tolerance=0.1
         right_max = max_buildings * right_clusters
 
         if left_count < left_min or right_count < right_min:
-            # Try to adjust split point to meet minimum
-            for i in range(len(cumulative_counts)):
-                lc = cumulative_counts[i]
-                rc = total - lc
-                if lc >= left_min and rc >= right_min and lc <= left_max and rc <= right_max:
-                    split_idx = i
-                    left_count = lc
-                    right_count = rc
-                    break
+            # Try to adjust split point to meet minimum: first split point satisfying every bound
+            right_counts = total - cumulative_counts
+            feasible = np.flatnonzero(
+                (cumulative_counts >= left_min) & (right_counts >= right_min) &
+                (cumulative_counts <= left_max) & (right_counts <= right_max)
+            )
+            if len(feasible) > 0:
+                split_idx = feasible[0]
+                left_count = cumulative_counts[split_idx]
+                right_count = right_counts[split_idx]
             else:
                 print(
                     f"Warning: Cannot split {len(indices)} grids into {left_clusters}+{right_clusters} clusters within constraints")
@@ -738,43 +899,46 @@ def grid_clustering(grid_centroids, building_counts, num_clusters, tolerance=0.1
 
     def post_process_assignments():
         """Adjust cluster assignments to meet min/max constraints."""
+        # Running building totals per cluster, kept in sync as grids move
+        cluster_totals = np.bincount(assigned[assigned >= 0], weights=building_counts[assigned >= 0],
+                                     minlength=num_clusters)
         for cluster_id in range(num_clusters):
             cluster_indices = np.where(assigned == cluster_id)[0]
-            cluster_count = building_counts[cluster_indices].sum()
-            if cluster_count < min_buildings:
+            if cluster_totals[cluster_id] < min_buildings:
                 # Find grids from other clusters to add
                 other_clusters = [i for i in range(num_clusters) if i != cluster_id]
                 for other_id in other_clusters:
-                    other_indices = np.where(assigned == other_id)[0]
-                    other_count = building_counts[other_indices].sum()
-                    if other_count > min_buildings:
+                    if cluster_totals[other_id] > min_buildings:
                         # Sort by distance to cluster centroid
+                        other_indices = np.where(assigned == other_id)[0]
                         cluster_centroid = grid_centroids[cluster_indices].mean(axis=0)
                         distances = np.linalg.norm(grid_centroids[other_indices] - cluster_centroid, axis=1)
                         sorted_other = other_indices[np.argsort(distances)]
                         for idx in sorted_other:
-                            if cluster_count < min_buildings and other_count > min_buildings:
+                            if cluster_totals[cluster_id] < min_buildings and cluster_totals[other_id] > min_buildings:
                                 assigned[idx] = cluster_id
-                                cluster_count += building_counts[idx]
-                                other_count -= building_counts[idx]
+                                cluster_totals[cluster_id] += building_counts[idx]
+                                cluster_totals[other_id] -= building_counts[idx]
                             else:
                                 break
-            elif cluster_count > max_buildings:
+            elif cluster_totals[cluster_id] > max_buildings:
                 # Move grids to other clusters
                 other_clusters = [i for i in range(num_clusters) if i != cluster_id]
                 for other_id in other_clusters:
-                    other_indices = np.where(assigned == other_id)[0]
-                    other_count = building_counts[other_indices].sum()
-                    if other_count < max_buildings:
+                    if cluster_totals[other_id] < max_buildings:
+                        # Only grids still in this cluster can move; earlier passes may have moved some
+                        cluster_indices = np.where(assigned == cluster_id)[0]
+                        other_indices = np.where(assigned == other_id)[0]
                         cluster_centroid = grid_centroids[other_indices].mean(axis=0) if len(other_indices) > 0 else \
                         grid_centroids[cluster_indices].mean(axis=0)
                         distances = np.linalg.norm(grid_centroids[cluster_indices] - cluster_centroid, axis=1)
                         sorted_cluster = cluster_indices[np.argsort(distances)]
                         for idx in sorted_cluster:
-                            if cluster_count > max_buildings and other_count + building_counts[idx] <= max_buildings:
+                            if cluster_totals[cluster_id] > max_buildings and \
+                                    cluster_totals[other_id] + building_counts[idx] <= max_buildings:
                                 assigned[idx] = other_id
-                                cluster_count -= building_counts[idx]
-                                other_count += building_counts[idx]
+                                cluster_totals[cluster_id] -= building_counts[idx]
+                                cluster_totals[other_id] += building_counts[idx]
                             else:
                                 break
 
@@ -813,7 +977,7 @@ def get_building_density_v2():
         grid_gdf, buildings_geojson = assign_buildings_to_grids(buildings_geojson, grid_gdf)
 
         # Cluster grids
-        coords = np.array([[point.x, point.y] for point in grid_gdf.centroid])
+        coords = shapely.get_coordinates(grid_gdf['centroid'].to_numpy())
         weights = grid_gdf['building_count'].values
         valid_mask = weights > 0
 
@@ -826,7 +990,7 @@ def get_building_density_v2():
         total_buildings = valid_weights.sum()
         _, min_size, max_size = _calculate_cluster_sizes(total_buildings, num_clusters, tolerance)
 
-        labels = grid_clustering(valid_coords, valid_weights, num_clusters)
+        labels = grid_clustering(_project_to_local_meters(valid_coords), valid_weights, num_clusters)
 
         grid_gdf['cluster_label'] = -1
         grid_gdf.loc[valid_mask, 'cluster_label'] = labels
@@ -839,7 +1003,7 @@ def get_building_density_v2():
 
         # Convert grids to GeoJSON, excluding the centroid column
         grid_gdf_for_json = grid_gdf.drop(columns=['centroid'])  # Drop non-serializable centroid column
-        grid_geojson = json.loads(grid_gdf_for_json.to_json())
+        grid_geojson = orjson.loads(grid_gdf_for_json.to_json())
 
         # Prepare clusters data
         clusters = [